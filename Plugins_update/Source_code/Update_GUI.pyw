@@ -1,33 +1,44 @@
 from typing import Any
 
 import re
+import sys
+import sqlite3
 
 import tkinter as tk
-from tkinter import PhotoImage, BooleanVar
+from tkinter import PhotoImage
 from tkinter import filedialog, ttk
 
 from pathlib import Path
+from zipfile import BadZipFile
 
-from gui_support import SafeWidgetPatcher, ThreadTaskManager, GuiContext, Args, resource_path
+from gui_support import SafeWidgetPatcher, ThreadTaskManager, GuiContext, Args, VirtualList, PluginState, resource_path
 
 from vpn_launcher import is_vpn_connected, launch
-from db_handler import fetch_plugin_pack, update_files, update_paths
+from cache_server import CACHE_SERVE, CACHE_PORT, start_server
+from bundle_handler import import_bundle
+from db_handler import fetch_plugin_pack, update_files, update_paths, fetch_hashes, update_hashes, fetch_descriptors, update_descriptors
 from web_handler import process_plugins, get_driver
-from files_handler import clean_plugins, download_files, get_download_list, unpack_plugins, setup_plugins
+from files_handler import clean_plugins, download_files, get_download_list, unpack_plugins, setup_plugins, mark_installed
 
 # Экземпляр контекста для глобальной области видимости
 ctx: GuiContext = GuiContext()
 # Экземпляр менеджера задач для глобальной области видимости
 _manager = ThreadTaskManager()
 
+# Количество одновременно видимых строк в списке plugin'ов и высота строки
+VISIBLE_ROWS: int = 11
+ROW_HEIGHT: int = 40
+
 
 def lock_buttons(frame: ttk.Frame) -> None:
     """
     Блокировка интерфейса
-    Кнопки, поля ввода, чекбоксы
+    Кнопки, поля ввода, чекбоксы, в том числе во вложенных фреймах (список plugin'ов)
 
     """
     for child in frame.winfo_children():
+        if isinstance(child, ttk.Frame):
+            lock_buttons(child)
         if isinstance(child, ttk.Button):
             child.state(['disabled'])
         if isinstance(child, tk.Entry):
@@ -44,6 +55,8 @@ def unlock_buttons(frame: ttk.Frame) -> None:
 
     """
     for child in frame.winfo_children():
+        if isinstance(child, ttk.Frame):
+            unlock_buttons(child)
         if isinstance(child, ttk.Button):
             child.state(['!disabled'])
         if isinstance(child, tk.Entry):
@@ -283,15 +296,16 @@ def set_style() -> None:
                     )  # нижний тёмный край (выключить)
 
 
-def set_window(root: tk.Tk) -> None:
+def set_window(root: tk.Tk) -> ttk.Frame:
     """
     Настройка root-окна
 
     :param root: root-окно
+    :return: основной контейнер с виджетами
 
     """
-    plugin_count: int = len(ctx.plugins_pack)
-    window_height: int = 300 + 40 * plugin_count
+    plugin_count: int = min(len(ctx.plugins_pack), VISIBLE_ROWS)
+    window_height: int = 300 + ROW_HEIGHT * plugin_count
 
     icon: PhotoImage = PhotoImage(file=resource_path('image/logo.png'))
     tile_text: str = 'Обновление и установка plugins для PyCharm v1.0'
@@ -311,7 +325,7 @@ def set_window(root: tk.Tk) -> None:
 
     set_widgets(main_frame)
 
-    return None
+    return main_frame
 
 
 def set_widgets(frame: ttk.Frame) -> None:
@@ -400,28 +414,36 @@ def set_widgets(frame: ttk.Frame) -> None:
     clean_btn = ttk.Button(frame, text='Очистить все', style='Low.TButton', command=lambda: manage_marks(False))
     clean_btn.place(x=130, y=vert_pos, width=100, height=24)
 
-    # Плагины с прогресс-барами
+    # Поиск по имени и url plugin'а
+    search_label: ttk.Label = ttk.Label(frame, text='Поиск:', font=('Arial', 11))
+    search_label.place(x=430, y=vert_pos)
+    search_entry: tk.Entry = entry(frame)
+    search_entry.place(x=490, y=vert_pos, width=290, height=24)
+
+    # Плагины с прогресс-барами, виджеты создаются только для видимых строк
     vert_pos += 45
 
     ctx.plugins.clear()  # checked plugins
     ctx.progress.clear()  # progress_bar
     ctx.labels.clear()  # progress_label
 
-    for plugin in ctx.plugins_pack:
-        check_state: tk.BooleanVar = tk.BooleanVar(value=False)
-        check_plugin: tk.Checkbutton = checkbox(frame, text=plugin['name'], variable=check_state, command=lambda: manage_marks())
-        check_plugin.place(x=20, y=vert_pos)
-        ctx.plugins.append(check_state)
+    plugin_list: VirtualList = VirtualList(
+            frame,
+            ctx.plugins_pack,
+            rows=VISIBLE_ROWS,
+            row_height=ROW_HEIGHT,
+            checkbox_factory=checkbox,
+            on_toggle=lambda: manage_marks()
+    )
+    plugin_list.place(x=0, y=vert_pos, width=800, height=ROW_HEIGHT * min(len(ctx.plugins_pack), VISIBLE_ROWS))
 
-        progress_bar: ttk.Progressbar = ttk.Progressbar(frame, orient='horizontal', length=430, mode='determinate', maximum=100)
-        progress_bar.place(x=210, y=vert_pos + 2)
-        ctx.progress.append(progress_bar)
+    ctx.plugins.extend(plugin_list.states)
+    ctx.progress.extend(plugin_list.progress)
+    ctx.labels.extend(plugin_list.labels)
 
-        progress_label: ttk.Label = ttk.Label(frame, text='не выбран', font=('Arial', 11))
-        progress_label.place(x=650, y=vert_pos)
-        ctx.labels.append(progress_label)
+    search_entry.bind('<KeyRelease>', lambda _: plugin_list.filter(search_entry.get()))
 
-        vert_pos += 40
+    vert_pos += ROW_HEIGHT * min(len(ctx.plugins_pack), VISIBLE_ROWS)
 
     # Кнопки действий
     vert_pos += 10
@@ -702,7 +724,7 @@ def clear_sets() -> None:
     ctx.labels_set.clear()
 
 
-def make_sets(data_set: list[dict[str, Any] | BooleanVar], option: str = None) -> None:
+def make_sets(data_set: list[dict[str, Any] | PluginState], option: str = None) -> None:
     """
     Создание ctx.set по выбранным плагинам
 
@@ -716,6 +738,7 @@ def make_sets(data_set: list[dict[str, Any] | BooleanVar], option: str = None) -
     elif option.casefold() == 'boolean':
         for index, state in enumerate(data_set):
             if state.get():
+                ctx.plugins_pack[index].pop('installed', None)
                 ctx.plugins_set.append(ctx.plugins_pack[index])
                 ctx.progress_set.append(ctx.progress[index])
                 ctx.labels_set.append(ctx.labels[index])
@@ -742,8 +765,10 @@ def download_plugins(vnp_args: Args) -> None:
     _manager.add_task(make_sets, ctx.plugins, 'boolean')
     _manager.add_task(process_plugins, ctx)
     _manager.add_task(clean_plugins)
+    _manager.add_task(fetch_hashes, ctx.plugins_set)
     _manager.add_task(download_files, ctx)
     _manager.add_task(update_files, ctx.plugins_set)
+    _manager.add_task(update_hashes, ctx.plugins_set)
 
     _manager.wait_ready(vnp_args.frame, lambda: unlock_buttons(vnp_args.frame))
 
@@ -792,10 +817,15 @@ def load_and_set_plugins(vnp_args: Args, charm_args: Args) -> None:
     clear_sets()
 
     _manager.add_task(make_sets, ctx.plugins, 'boolean')
-    _manager.add_task(process_plugins, ctx)
+    _manager.add_task(process_plugins, ctx, versions=True)
+    _manager.add_task(fetch_descriptors, ctx.descriptors)
+    _manager.add_task(mark_installed, ctx, charm_args.entry.get())
+    _manager.add_task(update_descriptors, ctx.descriptors)
     _manager.add_task(clean_plugins)
+    _manager.add_task(fetch_hashes, ctx.plugins_set)
     _manager.add_task(download_files, ctx)
     _manager.add_task(update_files, ctx.plugins_set)
+    _manager.add_task(update_hashes, ctx.plugins_set)
     _manager.add_task(unpack_plugins, ctx)
     _manager.add_task(update_paths, ctx.plugins_set)
     _manager.add_task(setup_plugins, ctx, charm_args.entry.get())
@@ -803,6 +833,89 @@ def load_and_set_plugins(vnp_args: Args, charm_args: Args) -> None:
     _manager.wait_ready(charm_args.frame, lambda: unlock_buttons(charm_args.frame))
 
 
+def bundle_argument(argv: list[str]) -> tuple[Path | None, str]:
+    """
+    Возвращает путь к офлайн-архиву plugin'ов из параметра --bundle <файл архива>
+    и сообщение об ошибке или пустую строку.
+
+    """
+    if '--bundle' not in argv:
+        return None, ''
+
+    position: int = argv.index('--bundle') + 1
+    if position >= len(argv):
+        return None, 'Не указан файл архива plugin\'ов.'
+
+    return Path(argv[position]), ''
+
+
+def load_bundle(bundle_path: Path, result: dict[str, Any]) -> None:
+    """
+    Импортирует офлайн-архив plugin'ов (выполняется в фоновом потоке).
+    В result записываются количество импортированных plugin'ов 'imported' и сообщение об ошибке 'fault'.
+
+    """
+    try:
+        result['imported'], damaged = import_bundle(bundle_path)
+    except (BadZipFile, KeyError, ValueError, OSError):
+        result['fault'] = 'Не удалось прочитать архив plugin\'ов.'
+        return
+    except sqlite3.Error:
+        result['fault'] = 'Не удалось записать plugin\'ы из архива в базу данных.'
+        return
+
+    if damaged:
+        result['fault'] = f'В архиве повреждено файлов: {damaged}. Эти plugin\'ы не импортированы.'
+
+
+def load_bundle_plugins(root: tk.Tk, frame: ttk.Frame, bundle_path: Path) -> None:
+    """
+    Импорт офлайн-архива при запуске: окно открыто, кнопки заблокированы до окончания импорта.
+    Если plugin'ы импортированы, список plugin'ов перечитывается из БД и окно перестраивается.
+
+    """
+    result: dict[str, Any] = {}
+    title: str = root.title()
+
+    lock_buttons(frame)
+    root.title(f'{title} :: импорт архива...')
+
+    def finish() -> None:
+        root.title(title)
+
+        if result.get('imported'):
+            ctx.plugins_pack = fetch_plugin_pack()
+            frame.destroy()
+            frame_new: ttk.Frame = set_window(root)
+        else:
+            unlock_buttons(frame)
+            frame_new: ttk.Frame = frame
+
+        if result.get('fault'):
+            show_faultbox('Plugins для PyCharm v1.0 :: Ошибка', result['fault'], frame_new)
+
+    _manager.add_task(load_bundle, bundle_path, result)
+    _manager.wait_ready(frame, finish)
+
+
+def serve_cache() -> str:
+    """
+    Запускает кэш-сервер, если задано PLUGINS_CACHE_SERVE=1.
+    Если порт занят (например, другой копией программы), программа работает без сервера.
+    Возвращает сообщение об ошибке или пустую строку.
+
+    """
+    if not CACHE_SERVE:
+        return ''
+
+    try:
+        start_server()
+    except OSError:
+        return f'Не удалось запустить кэш-сервер: порт {CACHE_PORT} занят. Программа работает без раздачи plugin\'ов.'
+
+    return ''
+
+
 def on_close() -> None:
     """
     Завершение работы
@@ -816,10 +929,17 @@ if __name__ == '__main__':
     root_window: tk.Tk = tk.Tk()
 
     # Действия перед открытием главного окна и при его закрытии
+    bundle_file, bundle_fault = bundle_argument(sys.argv)
     ctx.plugins_pack = fetch_plugin_pack()
     SafeWidgetPatcher.apply()
+    startup_faults: list[str] = [bundle_fault, serve_cache()]
     root_window.protocol("WM_DELETE_WINDOW", on_close)
 
     # Главный цикл приложения
-    set_window(root_window)
+    window_frame: ttk.Frame = set_window(root_window)
+    startup_fault: str = '\n'.join(fault for fault in startup_faults if fault)
+    if startup_fault:
+        root_window.after(100, lambda: show_faultbox('Plugins для PyCharm v1.0 :: Ошибка', startup_fault, root_window))  # noqa parameter unfilled
+    if bundle_file is not None:
+        load_bundle_plugins(root_window, window_frame, bundle_file)
     root_window.mainloop()
\ No newline at end of file
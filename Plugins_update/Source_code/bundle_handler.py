@@ -0,0 +1,165 @@
+from typing import Any
+
+import sys
+import json
+import hashlib
+import datetime
+
+from pathlib import Path
+from zipfile import ZipFile, ZIP_STORED, BadZipFile
+
+from db_handler import fetch_plugin_pack, fetch_file_records, update_hashes, import_plugins
+from files_handler import verified_files, plugin_save_path, artifact_lock
+from lock_handler import hold_lock
+
+
+# Имя манифеста и папка с файлами plugin'ов внутри архива
+BUNDLE_MANIFEST: str = 'manifest.json'
+BUNDLE_FILES: str = 'files'
+
+# Версия формата архива
+BUNDLE_VERSION: int = 1
+
+
+def export_bundle(bundle_path: Path) -> int:
+    """
+    Упаковывает проверенные скачанные plugin'ы и их записи из 'pycharm_plugins' в один архив с манифестом.
+    Файлы plugin'ов уже сжаты, поэтому записываются без сжатия.
+
+    :return: Количество plugin'ов в архиве.
+
+    """
+    verified: dict[str, dict] = verified_files(fetch_file_records())
+    entries: list[dict[str, Any]] = []
+
+    with ZipFile(bundle_path, 'w', ZIP_STORED) as bundle:
+        for plugin in fetch_plugin_pack() or []:
+            artifact: dict | None = verified.get(plugin.get('file'))
+            if artifact is None:
+                continue
+
+            bundle.write(artifact['path'], f'{BUNDLE_FILES}/{plugin["file"]}')
+            entries.append({
+                'name': plugin['name'],
+                'url': plugin['url'],
+                'file': plugin['file'],
+                'folder': plugin.get('folder'),
+                'sha256': artifact['sha256'],
+                'file_size': artifact['file_size'],
+            })
+
+        manifest: dict[str, Any] = {
+            'version': BUNDLE_VERSION,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'plugins': entries,
+        }
+        bundle.writestr(BUNDLE_MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    return len(entries)
+
+
+def is_safe_name(name: Any) -> bool:
+    """
+    Проверяет, что имя из манифеста можно использовать как имя файла или папки:
+    непустая строка без разделителей пути, ':' и '..'.
+
+    """
+    return isinstance(name, str) and bool(name) and not any(part in name for part in ('/', '\\', '..', ':'))
+
+
+def is_safe_entry(entry: dict[str, Any]) -> bool:
+    """
+    Проверяет поля 'file', 'name' и 'folder' записи манифеста, из которых строятся пути.
+
+    """
+    return (is_safe_name(entry.get('file')) and is_safe_name(entry.get('name'))
+            and (entry.get('folder') is None or is_safe_name(entry['folder'])))
+
+
+def extract_artifact(bundle: ZipFile, entry: dict[str, Any], save_path: Path, chunk_size: int = 1024 * 1024) -> bool:
+    """
+    Извлекает файл plugin'а из архива через временный .part, проверяя размер и SHA-256 по манифесту.
+
+    :return: True, если файл извлечён и не поврежден.
+
+    """
+    part_path: Path = save_path.with_name(f'{save_path.name}.part')
+    digest = hashlib.sha256()
+    extracted: int = 0
+
+    try:
+        with bundle.open(f'{BUNDLE_FILES}/{entry["file"]}') as source, open(part_path, 'wb') as file:
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                file.write(chunk)
+                digest.update(chunk)
+                extracted += len(chunk)
+
+        if extracted != entry['file_size'] or digest.hexdigest() != entry['sha256']:
+            return False
+
+        part_path.replace(save_path)
+        return True
+
+    except (KeyError, BadZipFile, OSError):
+        return False
+
+    finally:
+        part_path.unlink(missing_ok=True)
+
+
+def import_bundle(bundle_path: Path) -> tuple[int, int]:
+    """
+    Переносит plugin'ы из архива в папку 'plugins' и записывает их данные в БД без обращения к сети.
+    Записи манифеста с недопустимыми именами файла, plugin'а или папки считаются повреждёнными.
+    После импорта plugin'ы устанавливаются кнопкой 'Установить' (unpack_plugins и setup_plugins).
+
+    :return: (количество импортированных plugin'ов, количество повреждённых файлов).
+
+    """
+    imported: list[dict[str, Any]] = []
+    damaged: int = 0
+
+    with ZipFile(bundle_path, 'r') as bundle:
+        manifest: dict[str, Any] = json.loads(bundle.read(BUNDLE_MANIFEST))
+
+        for entry in manifest.get('plugins', []):
+            if not is_safe_entry(entry):
+                damaged += 1
+                continue
+
+            save_path: Path | None = plugin_save_path(entry)
+            if save_path is None:
+                continue
+
+            save_path.parent.mkdir(parents=True, exist_ok=True)
+
+            with hold_lock(artifact_lock(entry['file'])):
+                if not extract_artifact(bundle, entry, save_path):
+                    damaged += 1
+                    continue
+
+                entry['file_mtime'] = save_path.stat().st_mtime_ns
+
+            imported.append(entry)
+
+    import_plugins(imported)
+    update_hashes(imported)
+
+    return len(imported), damaged
+
+
+if __name__ == '__main__':
+    commands: dict[str, str] = {
+        'export': 'python bundle_handler.py export <файл архива>',
+        'import': 'python bundle_handler.py import <файл архива>',
+    }
+
+    if len(sys.argv) != 3 or sys.argv[1] not in commands:
+        print('\n'.join(commands.values()))
+        sys.exit(1)
+
+    if sys.argv[1] == 'export':
+        print(f'plugin\'ов в архиве: {export_bundle(Path(sys.argv[2]))}')
+    else:
+        count, failed = import_bundle(Path(sys.argv[2]))
+        print(f'импортировано plugin\'ов: {count}, повреждено: {failed}')
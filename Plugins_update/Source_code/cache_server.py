@@ -0,0 +1,76 @@
+import os
+import json
+import shutil
+import threading
+
+from urllib.parse import unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from db_handler import fetch_file_records
+from files_handler import verified_files
+
+
+# Порт кэш-сервера в локальной сети
+CACHE_PORT: int = int(os.environ.get('PLUGINS_CACHE_PORT', '8770'))
+
+# Включение режима кэш-сервера: PLUGINS_CACHE_SERVE=1
+CACHE_SERVE: bool = os.environ.get('PLUGINS_CACHE_SERVE', '') == '1'
+
+
+class CacheHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов кэш-сервера:
+    GET /index - список проверенных файлов с контрольными суммами в формате JSON;
+    GET /files/<имя файла> - содержимое файла.
+
+    """
+
+    def do_GET(self) -> None:  # noqa N802 имя задано BaseHTTPRequestHandler
+        index: dict[str, dict] = verified_files(fetch_file_records())
+
+        if self.path == '/index':
+            body: bytes = json.dumps({name: {'sha256': entry['sha256'], 'file_size': entry['file_size']} for name, entry in index.items()}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if self.path.startswith('/files/'):
+            entry: dict | None = index.get(unquote(self.path.removeprefix('/files/')))
+
+            if entry is not None:
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(entry['file_size']))
+                self.end_headers()
+                with open(entry['path'], 'rb') as file:
+                    shutil.copyfileobj(file, self.wfile)
+                return
+
+        self.send_error(404)
+
+    def log_message(self, *args) -> None:
+        """
+        Отключает вывод журнала запросов в консоль.
+
+        """
+        return None
+
+
+def start_server(port: int = CACHE_PORT) -> ThreadingHTTPServer:
+    """
+    Запускает кэш-сервер в фоновом потоке и возвращает его.
+    Остановка: server.shutdown().
+    Если порт занят, вызывает OSError.
+
+    """
+    server: ThreadingHTTPServer = ThreadingHTTPServer(('0.0.0.0', port), CacheHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    with ThreadingHTTPServer(('0.0.0.0', CACHE_PORT), CacheHandler) as cache_server:
+        cache_server.serve_forever()
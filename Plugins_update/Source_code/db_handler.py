@@ -15,17 +15,18 @@ def get_db_path() -> Path:
 
 def fetch_plugin_pack() -> list[dict[str, str]] | None:
     """
-     Извлекает 'name', 'url' и 'file' из таблицы 'pycharm_plugins' базы данных plugins.db.
+     Извлекает 'name', 'url', 'file' и 'folder' из таблицы 'pycharm_plugins' базы данных plugins.db.
 
      :return: Список словарей, каждый из которых содержит:
               - 'name': имя плагина (строка),
               - 'url': URL плагина (строка),
-              - 'file': имя файла плагина (строка).
+              - 'file': имя файла плагина (строка),
+              - 'folder': имя папки установленного плагина (строка).
               или None, если произошла ошибка при подключении к базе данных или выполнении запроса.
 
      """
     database_path: Path = get_db_path()
-    db_query: str = 'SELECT id, name, url, file FROM pycharm_plugins ORDER BY name COLLATE NOCASE'
+    db_query: str = 'SELECT id, name, url, file, folder FROM pycharm_plugins ORDER BY name COLLATE NOCASE'
 
     try:
         with sqlite3.connect(database_path) as connection:
@@ -84,4 +85,168 @@ def update_paths(plugins_set: list[dict[str, Any]]) -> None:
     with sqlite3.connect(database_path) as connection:
         cursor = connection.cursor()
         cursor.executemany(db_query, update_data)
-        connection.commit()
\ No newline at end of file
+        connection.commit()
+
+
+def create_hashes_table(connection: sqlite3.Connection) -> None:
+    """
+    Создаёт таблицу 'plugin_files' с контрольными суммами скачанных файлов, если её нет.
+
+    """
+    db_query: str = ('CREATE TABLE IF NOT EXISTS plugin_files ('
+                     'file TEXT PRIMARY KEY, '
+                     'sha256 TEXT NOT NULL, '
+                     'file_size INTEGER NOT NULL, '
+                     'file_mtime INTEGER NOT NULL)')
+    connection.execute(db_query)
+
+
+def fetch_file_records() -> dict[str, dict[str, Any]]:
+    """
+    Извлекает записи таблицы 'plugin_files'.
+
+    :return: Словарь {имя файла: {'sha256', 'file_size', 'file_mtime'}},
+             пустой, если произошла ошибка при работе с базой данных.
+
+    """
+    database_path: Path = get_db_path()
+    db_query: str = 'SELECT file, sha256, file_size, file_mtime FROM plugin_files'
+
+    try:
+        with sqlite3.connect(database_path) as connection:
+            create_hashes_table(connection)
+            connection.row_factory = sqlite3.Row
+            records: dict[str, dict[str, Any]] = {row['file']: dict(row) for row in connection.execute(db_query)}
+
+    except (sqlite3.OperationalError, sqlite3.DatabaseError):
+        return {}
+
+    return records
+
+
+def fetch_hashes(plugins_set: list[dict[str, Any]]) -> None:
+    """
+    Добавляет в словари плагинов сохранённые 'sha256' и 'file_mtime' по имени файла.
+    Если файл в таблице 'plugin_files' не найден, ключи удаляются.
+
+    :param plugins_set: Список словарей с ключом 'file'.
+
+    """
+    records: dict[str, dict[str, Any]] = fetch_file_records()
+
+    for plugin in plugins_set:
+        record: dict[str, Any] | None = records.get(plugin.get('file'))
+
+        if record is not None and record['file_size'] == plugin.get('file_size'):
+            plugin['sha256'] = record['sha256']
+            plugin['file_mtime'] = record['file_mtime']
+        else:
+            plugin.pop('sha256', None)
+            plugin.pop('file_mtime', None)
+
+
+def update_hashes(plugins_set: list[dict[str, Any]]) -> None:
+    """
+    Записывает контрольные суммы скачанных файлов в таблицу 'plugin_files'.
+
+    :param plugins_set: Список словарей с ключами 'file', 'sha256', 'file_size' и 'file_mtime'.
+
+    """
+    database_path: Path = get_db_path()
+
+    # Список (file, sha256, file_size, file_mtime) для обновления
+    keys: tuple[str, ...] = ('file', 'sha256', 'file_size', 'file_mtime')
+    update_data: list[tuple[Any, ...]] = [tuple(plugin[key] for key in keys) for plugin in plugins_set if all(plugin.get(key) is not None for key in keys)]
+
+    if not update_data:
+        return
+
+    db_query: str = 'INSERT OR REPLACE INTO plugin_files (file, sha256, file_size, file_mtime) VALUES (?, ?, ?, ?)'
+
+    with sqlite3.connect(database_path) as connection:
+        create_hashes_table(connection)
+        cursor = connection.cursor()
+        cursor.executemany(db_query, update_data)
+        connection.commit()
+
+
+def create_descriptors_table(connection: sqlite3.Connection) -> None:
+    """
+    Создаёт таблицу 'plugin_descriptors' с версиями из jar-файлов установленных плагинов, если её нет.
+
+    """
+    db_query: str = ('CREATE TABLE IF NOT EXISTS plugin_descriptors ('
+                     'jar TEXT PRIMARY KEY, '
+                     'jar_mtime INTEGER NOT NULL, '
+                     'version TEXT)')
+    connection.execute(db_query)
+
+
+def fetch_descriptors(descriptors: dict[str, dict[str, Any]]) -> None:
+    """
+    Заполняет словарь descriptors записями таблицы 'plugin_descriptors':
+    {путь к jar-файлу: {'jar_mtime', 'version'}}.
+
+    """
+    database_path: Path = get_db_path()
+    db_query: str = 'SELECT jar, jar_mtime, version FROM plugin_descriptors'
+
+    descriptors.clear()
+
+    try:
+        with sqlite3.connect(database_path) as connection:
+            create_descriptors_table(connection)
+            connection.row_factory = sqlite3.Row
+            for row in connection.execute(db_query):
+                descriptors[row['jar']] = {'jar_mtime': row['jar_mtime'], 'version': row['version']}
+
+    except (sqlite3.OperationalError, sqlite3.DatabaseError):
+        return
+
+
+def update_descriptors(descriptors: dict[str, dict[str, Any]]) -> None:
+    """
+    Заменяет содержимое таблицы 'plugin_descriptors' словарём descriptors,
+    записи jar-файлов, которых нет в словаре, удаляются.
+
+    :param descriptors: {путь к jar-файлу: {'jar_mtime', 'version'}}.
+
+    """
+    database_path: Path = get_db_path()
+
+    # Список (jar, jar_mtime, version) для обновления
+    update_data: list[tuple[str, int, str | None]] = [(jar, record['jar_mtime'], record['version']) for jar, record in descriptors.items()]
+
+    db_query: str = 'INSERT OR REPLACE INTO plugin_descriptors (jar, jar_mtime, version) VALUES (?, ?, ?)'
+
+    with sqlite3.connect(database_path) as connection:
+        create_descriptors_table(connection)
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM plugin_descriptors')
+        cursor.executemany(db_query, update_data)
+        connection.commit()
+
+
+def import_plugins(plugins_set: list[dict[str, Any]]) -> None:
+    """
+    Добавляет плагины в таблицу 'pycharm_plugins' или обновляет 'url', 'file' и 'folder' уже известных плагинов.
+
+    :param plugins_set: Список словарей с ключами 'name', 'url', 'file' и 'folder'.
+
+    """
+    database_path: Path = get_db_path()
+
+    # Список (name, url, file, folder) для обновления
+    update_data: list[tuple[Any, ...]] = [(plugin['name'], plugin['url'], plugin.get('file'), plugin.get('folder')) for plugin in plugins_set if 'name' in plugin and 'url' in plugin]
+
+    if not update_data:
+        return
+
+    db_query: str = ('INSERT INTO pycharm_plugins (name, url, file, folder) VALUES (?, ?, ?, ?) '
+                     'ON CONFLICT(name) DO UPDATE SET url = excluded.url, file = excluded.file, '
+                     'folder = COALESCE(excluded.folder, pycharm_plugins.folder)')
+
+    with sqlite3.connect(database_path) as connection:
+        cursor = connection.cursor()
+        cursor.executemany(db_query, update_data)
+        connection.commit()
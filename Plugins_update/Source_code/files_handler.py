@@ -1,19 +1,74 @@
-from typing import TYPE_CHECKING
-
+from typing import TYPE_CHECKING, Any
+
+import os
+import sys
+import json
+import zlib
+import ctypes
+import time
 import shutil
+import hashlib
 import datetime
+import tempfile
 import requests
+import threading
 
 from tkinter import ttk
 from pathlib import Path
-from zipfile import ZipFile, BadZipFile
-from requests.exceptions import RequestException
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, quote
+from zipfile import ZipFile, ZipInfo, BadZipFile
+from xml.etree import ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import RequestException, HTTPError, Timeout, ChunkedEncodingError
 
 from gui_support import resource_path
+from lock_handler import FileLock, hold_lock, try_lock
 
 if TYPE_CHECKING:
     from gui_support import GuiContext
 
+# Количество попыток скачать файл после сетевой ошибки, зависания или если он пришёл повреждённым
+DOWNLOAD_ATTEMPTS: int = 3
+
+# Таймауты соединения и чтения (сек), пауза перед повтором загрузки (сек, удваивается с каждой попыткой)
+CONNECT_TIMEOUT: float = 10
+READ_TIMEOUT: float = 30
+RETRY_BACKOFF: float = 2
+
+# Загрузка считается зависшей, если за STALL_WINDOW секунд средняя скорость ниже STALL_MIN_RATE байт/с
+# (ожидание BandwidthLimiter в это время не входит)
+STALL_WINDOW: float = 30
+STALL_MIN_RATE: int = 1024
+
+# Количество одновременных загрузок, соединений с одним хостом и общее ограничение скорости (байт/с, None — без ограничения)
+DOWNLOAD_WORKERS: int = 4
+HOST_CONNECTIONS: int = 2
+BANDWIDTH_LIMIT: int | None = None
+
+# Адрес кэш-сервера в локальной сети, например http://192.168.0.10:8770 (пустая строка — не использовать)
+LAN_CACHE_URL: str = os.environ.get('PLUGINS_CACHE_URL', '').rstrip('/')
+
+# Количество потоков распаковки и минимальное число файлов в архиве для параллельной распаковки
+EXTRACT_WORKERS: int = min(8, os.cpu_count() or 1)
+PARALLEL_MIN_MEMBERS: int = 32
+
+# Папки рядом с '<pycharm>/plugins' для подготовки новых plugin'ов и для старых plugin'ов до их удаления
+STAGING_FOLDER: str = 'plugins.staging'
+TRASH_FOLDER: str = 'plugins.trash'
+
+# Приоритет потока удаления старых plugin'ов в Windows
+THREAD_PRIORITY_LOWEST: int = -2
+
+# Папка внутри 'unpacked' с манифестами распакованных архивов (размер и CRC-32 каждого файла)
+MANIFEST_DIR: str = '.manifests'
+
+# Папка для отчётов о загрузке: время загрузки страницы, ожидания в очереди и передачи каждого плагина
+REPORTS_FOLDER: str = 'reports'
+
+# Папка внутри 'plugins' с lock-файлами: файл занят, пока другой процесс держит его блокировку
+LOCKS_FOLDER: str = '.locks'
+
 
 def get_path(folder_type: str) -> Path | None:
     """
@@ -35,10 +90,51 @@ def get_path(folder_type: str) -> Path | None:
     return None
 
 
+def artifact_lock(file_name: str) -> Path:
+    """
+    Возвращает путь к lock-файлу файла плагина.
+    Блокировку держит процесс, который скачивает, распаковывает или удаляет этот файл.
+
+    """
+    return get_path('packed') / LOCKS_FOLDER / f'{file_name.removesuffix(".part")}.lock'
+
+
+def unpacked_lock(folder: str) -> Path:
+    """
+    Возвращает путь к lock-файлу папки плагина в 'unpacked'.
+    Блокировку держит процесс, который распаковывает plugin в эту папку или копирует её в PyCharm.
+
+    """
+    return get_path('packed') / LOCKS_FOLDER / 'unpacked' / f'{folder.lower()}.lock'
+
+
+def remove_unlocked(file_path: Path) -> None:
+    """
+    Удаляет файл плагина, если его блокировку не держит другой процесс.
+
+    """
+    with try_lock(artifact_lock(file_path.name)) as acquired:
+        if acquired:
+            file_path.unlink(missing_ok=True)
+
+
+def remove_locks(locks_path: Path) -> None:
+    """
+    Удаляет lock-файлы, блокировки которых никто не держит.
+
+    """
+    for lock_path in locks_path.rglob('*.lock'):
+        lock: FileLock = FileLock(lock_path)
+        if lock.acquire():
+            lock.discard()
+
+
 def clean_plugins() -> None:
     """
     Удаляет все файлы из папки 'plugins' кроме файлов, созданных сегодня.
-    Удаляет все папки из 'unpacked'.
+    Файлы, заблокированные другим процессом (загрузка или распаковка), не удаляются.
+    Удаляются lock-файлы, которые не держит ни один процесс.
+    Папки в 'unpacked' не удаляются: zip_extractor обновляет в них только изменившиеся файлы.
 
     """
     plugins_path: Path = get_path('packed')
@@ -55,19 +151,14 @@ def clean_plugins() -> None:
         if item.is_file():
             try:
                 created_date = datetime.date.fromtimestamp(item.stat().st_ctime)
-                if created_date != today:
-                    item.unlink()
+                if created_date == today:
+                    continue
+
+                remove_unlocked(item)
             except (PermissionError, FileNotFoundError):
                 pass
 
-    # Удаляем папки из unpacked полностью
-    if unpacked_path.exists():
-        for item in unpacked_path.iterdir():
-            if item.is_dir():
-                try:
-                    shutil.rmtree(item)
-                except (PermissionError, FileNotFoundError):
-                    pass
+    remove_locks(plugins_path / LOCKS_FOLDER)
 
 
 def get_download_list(plugins_pack) -> list[str]:
@@ -106,16 +197,16 @@ def update_jar(file_name: str, label: ttk.Label) -> None:
         label.config(text='файл распакован')
 
 
-def get_save_path(context: 'GuiContext', index: int) -> Path | None:
+def plugin_save_path(plugin: dict) -> Path | None:
     """
-    Формирует путь для сохранения файла плагина.
+    Формирует путь для сохранения файла плагина по ключам 'file' и 'name'.
 
     """
     plugins_path: Path = get_path('packed')
     unpacked_path: Path = get_path('unpacked')
 
-    save_name: str = context.plugins_set[index]['file']
-    plugin_name: str = context.plugins_set[index]['name']
+    save_name: str = plugin['file']
+    plugin_name: str = plugin['name']
 
     if save_name.endswith('.zip'):
         return plugins_path / save_name
@@ -128,62 +219,478 @@ def get_save_path(context: 'GuiContext', index: int) -> Path | None:
     return None
 
 
-def is_exist(file_path: Path) -> bool:
+def get_save_path(context: 'GuiContext', index: int) -> Path | None:
     """
-    Проверяет что файл уже закачан.
+    Формирует путь для сохранения файла плагина.
 
-    :param file_path:
-    :return:
     """
-    if file_path.exists():
+    return plugin_save_path(context.plugins_set[index])
+
+
+def find_file(file_name: str) -> Path | None:
+    """
+    Ищет скачанный файл в папке 'plugins' или jar-файл в 'plugins/unpacked/<plugin>/lib'.
+
+    """
+    packed_path: Path = get_path('packed') / file_name
+    if packed_path.is_file():
+        return packed_path
+
+    unpacked_path: Path = get_path('unpacked')
+    if unpacked_path.is_dir():
+        for jar_path in unpacked_path.glob(f'*/lib/{file_name}'):
+            return jar_path
+
+    return None
+
+
+def verified_files(records: dict[str, dict]) -> dict[str, dict]:
+    """
+    Возвращает проверенные скачанные файлы: {имя файла: {'path', 'sha256', 'file_size'}}.
+    Файл считается проверенным, если его размер и время изменения совпадают с записью records
+    (см. db_handler.fetch_file_records), файл при этом не перечитывается.
+
+    """
+    verified: dict[str, dict] = {}
+
+    for file_name, record in records.items():
+        file_path: Path | None = find_file(file_name)
+        if file_path is None:
+            continue
+
+        stat = file_path.stat()
+        if stat.st_size == record['file_size'] and stat.st_mtime_ns == record['file_mtime']:
+            verified[file_name] = {'path': file_path, 'sha256': record['sha256'], 'file_size': record['file_size']}
+
+    return verified
+
+
+def file_hash(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Вычисляет SHA-256 файла за один проход.
+
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_valid(file_path: Path, plugin: dict) -> bool:
+    """
+    Проверяет что файл уже закачан и не поврежден.
+    Если размер и время изменения совпадают с сохранёнными в БД, файл не перечитывается.
+    Если сохранённой контрольной суммы нет, файл проверяется как новый (is_intact: оглавление zip/jar-архива),
+    и только после этого его контрольная сумма добавляется в plugin.
+
+    """
+    if not file_path.is_file():
+        return False
+
+    stat = file_path.stat()
+    if stat.st_size != plugin.get('file_size'):
+        return False
+
+    if plugin.get('sha256') and plugin.get('file_mtime') == stat.st_mtime_ns:
         return True
-    else:
+
+    digest: str = file_hash(file_path)
+    if plugin.get('sha256'):
+        if plugin['sha256'] != digest:
+            return False
+
+    elif not is_intact(file_path, plugin, stat.st_size, digest, None):
         return False
 
+    plugin['sha256'] = digest
+    plugin['file_mtime'] = stat.st_mtime_ns
+    return True
+
 
-def download_files(context: 'GuiContext', chunk_size: int = 4096) -> None:
+def is_intact(file_path: Path, plugin: dict, downloaded: int, digest: str, expected: str | None) -> bool:
     """
-    Загружает файлы, обновляя прогресс в GUI.
+    Проверяет только что скачанный файл: размер, ожидаемая контрольная сумма expected (если известна)
+    и оглавление zip/jar-архива (читается только центральный каталог).
 
     """
-    for index, plugin in enumerate(context.plugins_set):
+    if downloaded != plugin.get('file_size'):
+        return False
+
+    if expected and expected != digest:
+        return False
+
+    try:
+        with ZipFile(file_path, 'r'):
+            pass
+    except (BadZipFile, OSError):
+        return False
 
-        current_label: ttk.Label = context.labels_set[index]
-        current_progress: ttk.Progressbar = context.progress_set[index]
+    return True
 
-        download_url: str | None = plugin.get('download_url')
-        total_size: int | None = plugin.get('file_size')
-        file_name: str | None = plugin.get('file')
 
-        if not all([download_url, total_size, file_name]):
-            current_label.config(text='ошибка загрузки')
-            continue
+class BandwidthLimiter:
+    """
+    Общее ограничение скорости загрузки для всех потоков.
+    Каждый фрагмент резервирует своё время передачи, поток ждёт наступления своего интервала.
+
+    """
+
+    def __init__(self, rate: int | None = None) -> None:
+        self._rate: int | None = rate
+        self._lock = threading.Lock()
+        self._moment: float = time.monotonic()
+
+    def consume(self, amount: int) -> float:
+        """
+        Ожидает, пока фрагмент размером amount байт укладывается в ограничение скорости.
+        Без ограничения (rate равен None или 0) возвращается сразу.
+
+        :return: Время ожидания (сек).
+
+        """
+        if not self._rate:
+            return 0.0
+
+        with self._lock:
+            now: float = time.monotonic()
+            self._moment = max(self._moment, now)
+            delay: float = self._moment - now
+            self._moment += amount / self._rate
+
+        if delay <= 0:
+            return 0.0
+
+        time.sleep(delay)
+        return delay
+
+
+class TransferStalled(RequestException):
+    """
+    Загрузка зависла: за STALL_WINDOW секунд получено меньше STALL_MIN_RATE байт/с.
+
+    """
+
+
+@dataclass
+class Partial:
+    """
+    Состояние частично скачанного файла для продолжения загрузки с последнего байта
+
+    """
+    digest: Any = field(default_factory=hashlib.sha256)
+    size: int = 0
+
+
+def fetch_file(download_url: str, part_path: Path, label: ttk.Label, progress: ttk.Progressbar, chunk_size: int, limiter: BandwidthLimiter, partial: Partial) -> None:
+    """
+    Скачивает файл по частям, одновременно вычисляя SHA-256, и обновляет partial.
+    Если partial.size больше нуля, загрузка продолжается с последнего байта (заголовок Range),
+    а если сервер не поддерживает Range, файл скачивается заново.
+    Соединение ограничено CONNECT_TIMEOUT и READ_TIMEOUT, зависание определяется по STALL_WINDOW и STALL_MIN_RATE,
+    время ожидания ограничения скорости из окна исключается.
+
+    """
+    headers: dict[str, str] = {'Range': f'bytes={partial.size}-'} if partial.size else {}
+
+    with requests.get(download_url, stream=True, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+        response.raise_for_status()
+
+        if response.status_code != 206:
+            partial.digest = hashlib.sha256()
+            partial.size = 0
+
+        window_start: float = time.monotonic()
+        window_size: int = 0
+
+        with open(part_path, 'ab' if partial.size else 'wb') as file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if not chunk:
+                    continue
+                window_start += limiter.consume(len(chunk))
+                file.write(chunk)
+                partial.digest.update(chunk)
+                partial.size += len(chunk)
+                update_progress(label, progress, partial.size)
+
+                window_size += len(chunk)
+                now: float = time.monotonic()
+                if now - window_start >= STALL_WINDOW:
+                    if window_size < STALL_MIN_RATE * STALL_WINDOW:
+                        raise TransferStalled(download_url)
+                    window_start, window_size = now, 0
+
+
+def failure_reason(error: Exception) -> str:
+    """
+    Возвращает текст для label по типу ошибки загрузки.
+
+    """
+    if isinstance(error, TransferStalled):
+        return 'загрузка зависла'
+
+    if isinstance(error, Timeout) or 'timed out' in str(error):
+        return 'таймаут'
+
+    if isinstance(error, HTTPError) and error.response is not None:
+        return f'ошибка сервера {error.response.status_code}'
+
+    if isinstance(error, (requests.ConnectionError, ChunkedEncodingError)):
+        return 'нет соединения'
+
+    if isinstance(error, OSError) and not isinstance(error, RequestException):
+        return 'ошибка записи'
+
+    return 'ошибка загрузки'
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Проверяет, имеет ли смысл повторять загрузку после ошибки.
+    Не повторяются ошибки записи на диск и ответы 4xx кроме 408 и 429.
+
+    """
+    if isinstance(error, HTTPError) and error.response is not None:
+        status: int = error.response.status_code
+        return status >= 500 or status in (408, 429)
+
+    return isinstance(error, RequestException)
+
+
+@dataclass
+class Transfer:
+    """
+    Общие параметры загрузки для всех потоков
+
+    """
+    host_slots: dict[str, threading.Semaphore]
+    limiter: BandwidthLimiter
+    start: float
+    chunk_size: int
+    lan_files: dict[str, dict] = field(default_factory=dict)
+
+
+def lan_index() -> dict[str, dict]:
+    """
+    Запрашивает список проверенных файлов у кэш-сервера в локальной сети (LAN_CACHE_URL).
+    Возвращает {имя файла: {'sha256', 'file_size'}} или пустой словарь, если сервер не задан или недоступен.
+
+    """
+    if not LAN_CACHE_URL:
+        return {}
+
+    try:
+        response: requests.Response = requests.get(f'{LAN_CACHE_URL}/index', timeout=2)
+        response.raise_for_status()
+        return response.json()
+
+    except (RequestException, ValueError):
+        return {}
+
+
+def fetch_verified(download_url: str, save_path: Path, plugin: dict, context: 'GuiContext', index: int,
+                   transfer: Transfer, limiter: BandwidthLimiter, expected: str | None, attempts: int) -> bool:
+    """
+    Скачивает файл во временный .part и переносит его в save_path, если файл не поврежден.
+    После сетевой ошибки загрузка повторяется с последнего байта с паузой RETRY_BACKOFF * 2^n секунд,
+    повреждённый файл скачивается заново, всего не более attempts попыток.
+    Причина последней ошибки записывается в 'failure' и выводится на label.
+
+    :return: True, если файл скачан и проверен.
+
+    """
+    current_label: ttk.Label = context.labels_set[index]
+    current_progress: ttk.Progressbar = context.progress_set[index]
+    part_path: Path = save_path.with_name(f'{save_path.name}.part')
+    partial: Partial = Partial()
+
+    plugin.pop('failure', None)
+
+    try:
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+            try:
+                fetch_file(download_url, part_path, current_label, current_progress, transfer.chunk_size, limiter, partial)
+
+            except (RequestException, OSError) as error:
+                plugin['failure'] = failure_reason(error)
+                current_label.config(text=plugin['failure'])
+                if not is_retryable(error):
+                    return False
+                continue
+
+            digest: str = partial.digest.hexdigest()
+
+            if is_intact(part_path, plugin, partial.size, digest, expected):
+                part_path.replace(save_path)
+                plugin['sha256'] = digest
+                plugin['file_mtime'] = save_path.stat().st_mtime_ns
+                plugin.pop('failure', None)
+                return True
+
+            plugin['failure'] = 'файл поврежден'
+            current_label.config(text=plugin['failure'])
+            partial = Partial()
+
+    finally:
+        part_path.unlink(missing_ok=True)
+
+    return False
+
+
+def from_lan(save_path: Path, plugin: dict, context: 'GuiContext', index: int, transfer: Transfer) -> bool:
+    """
+    Пробует скачать файл из кэша в локальной сети, если там есть файл с тем же именем, размером и хешем.
+    Загрузка из локальной сети не учитывается в ограничениях хоста и скорости.
+
+    """
+    cached: dict | None = transfer.lan_files.get(plugin['file'])
+
+    if not cached or cached.get('file_size') != plugin['file_size']:
+        return False
+
+    if plugin.get('sha256') and plugin['sha256'] != cached.get('sha256'):
+        return False
+
+    lan_url: str = f'{LAN_CACHE_URL}/files/{quote(plugin["file"])}'
+    return fetch_verified(lan_url, save_path, plugin, context, index, transfer, BandwidthLimiter(), cached.get('sha256'), 1)
+
+
+def download_plugin(context: 'GuiContext', index: int, transfer: Transfer) -> None:
+    """
+    Загружает один файл плагина, обновляя прогресс в GUI.
+    Сначала ищет файл в кэше локальной сети, при промахе скачивает из маркета.
+    Если тот же файл уже скачивает другой процесс, ждёт окончания его загрузки и использует её результат.
+    Записывает время ожидания в очереди 'queue_time' и время передачи 'transfer_time' в секундах.
+
+    """
+    plugin: dict = context.plugins_set[index]
+    save_path: Path = get_save_path(context, index)
+    part_path: Path = save_path.with_name(f'{save_path.name}.part')
+
+    def show_foreign() -> None:
+        try:
+            context.progress_set[index]['value'] = part_path.stat().st_size
+        except OSError:
+            pass
+        context.labels_set[index].config(text='загружается другой копией')
+
+    context.progress_set[index].configure(maximum=plugin['file_size'])
 
-        save_path: Path = get_save_path(context, index)
-        current_progress.configure(maximum=total_size)
+    with hold_lock(artifact_lock(plugin['file']), show_foreign):
+        download_locked(context, index, transfer, save_path)
 
-        if is_exist(save_path):
-            update_progress(current_label, current_progress, total_size)
+
+def download_locked(context: 'GuiContext', index: int, transfer: Transfer, save_path: Path) -> None:
+    """
+    Загружает файл плагина, пока процесс держит его блокировку.
+
+    """
+    plugin: dict = context.plugins_set[index]
+
+    current_label: ttk.Label = context.labels_set[index]
+    current_progress: ttk.Progressbar = context.progress_set[index]
+
+    download_url: str = plugin['download_url']
+    total_size: int = plugin['file_size']
+    file_name: str = plugin['file']
+
+    if is_valid(save_path, plugin):
+        plugin['queue_time'] = round(time.perf_counter() - transfer.start, 3)
+        plugin['transfer_time'] = 0.0
+        update_progress(current_label, current_progress, total_size)
+        update_jar(file_name, current_label)
+        return
+
+    transfer_start: float = time.perf_counter()
+    plugin['queue_time'] = round(transfer_start - transfer.start, 3)
+
+    if from_lan(save_path, plugin, context, index, transfer):
+        plugin['transfer_time'] = round(time.perf_counter() - transfer_start, 3)
+        update_jar(file_name, current_label)
+        return
+
+    with transfer.host_slots[urlsplit(download_url).netloc]:
+        transfer_start: float = time.perf_counter()
+        plugin['queue_time'] = round(transfer_start - transfer.start, 3)
+
+        if fetch_verified(download_url, save_path, plugin, context, index, transfer, transfer.limiter, plugin.get('sha256'), DOWNLOAD_ATTEMPTS):
             update_jar(file_name, current_label)
+
+        plugin['transfer_time'] = round(time.perf_counter() - transfer_start, 3)
+
+
+def write_download_report(plugins: list[dict], folder: Path | None = None) -> Path | None:
+    """
+    Записывает отчёт о загрузке в файл reports/download_<дата_время>.tsv:
+    имя плагина, время загрузки страницы маркета (сек) и объём её JS-кучи (байт, '-' если браузер не сообщает),
+    размер файла, время ожидания в очереди, время передачи (сек) и результат.
+    Возвращает путь к файлу или None, если загрузок не было.
+
+    """
+    if not plugins:
+        return None
+
+    folder: Path = folder or Path(resource_path(REPORTS_FOLDER))
+    folder.mkdir(parents=True, exist_ok=True)
+    report_path: Path = folder / f'download_{datetime.datetime.now():%Y%m%d_%H%M%S}.tsv'
+
+    lines: list[str] = ['plugin\tpage_time\tjs_heap\tfile_size\tqueue_time\ttransfer_time\tresult']
+    for plugin in plugins:
+        lines.append('\t'.join([
+            plugin['name'],
+            f'{plugin.get("page_time", 0):.3f}',
+            str(plugin.get('page_heap') or '-'),
+            str(plugin['file_size']),
+            f'{plugin.get("queue_time", 0):.3f}',
+            f'{plugin.get("transfer_time", 0):.3f}',
+            plugin.get('failure', 'ok'),
+        ]))
+
+    report_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return report_path
+
+
+def download_files(context: 'GuiContext', chunk_size: int = 4096, workers: int = DOWNLOAD_WORKERS, bandwidth: int | None = BANDWIDTH_LIMIT) -> None:
+    """
+    Загружает файлы в несколько потоков, обновляя прогресс в GUI.
+    Файлы ставятся в очередь от меньшего к большему, чтобы крупный плагин не задерживал остальные.
+    Число соединений с одним хостом ограничено HOST_CONNECTIONS, общая скорость — bandwidth (байт/с).
+    Если задан LAN_CACHE_URL, файлы сначала ищутся в кэше локальной сети.
+    Контрольная сумма вычисляется во время загрузки и записывается в 'sha256' и 'file_mtime'.
+    После сетевой ошибки загрузка продолжается с последнего байта, всего не более DOWNLOAD_ATTEMPTS попыток.
+    Время ожидания и передачи каждого плагина записывается в отчёт write_download_report.
+
+    """
+    pending: list[int] = []
+
+    for index, plugin in enumerate(context.plugins_set):
+        if plugin.get('installed'):
+            continue
+        if not all([plugin.get('download_url'), plugin.get('file_size'), plugin.get('file')]):
+            context.labels_set[index].config(text='ошибка загрузки')
             continue
+        pending.append(index)
 
-        try:
-            with requests.get(download_url, stream=True) as response:
-                response.raise_for_status()
-
-                with open(save_path, 'wb') as file:
-                    downloaded: int = 0
-                    for chunk in response.iter_content(chunk_size=chunk_size):
-                        if not chunk:
-                            continue
-                        file.write(chunk)
-                        downloaded += len(chunk)
-                        update_progress(current_label, current_progress, downloaded)
-                    update_jar(file_name, current_label)
-
-        except RequestException:
-            current_label.config(text='ошибка загрузки')
+    pending.sort(key=lambda position: context.plugins_set[position]['file_size'])
 
+    hosts: set[str] = {urlsplit(context.plugins_set[index]['download_url']).netloc for index in pending}
+    transfer: Transfer = Transfer(
+            host_slots={host: threading.Semaphore(HOST_CONNECTIONS) for host in hosts},
+            limiter=BandwidthLimiter(bandwidth),
+            start=time.perf_counter(),
+            chunk_size=chunk_size,
+            lan_files=lan_index() if pending else {},
+    )
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        tasks = [executor.submit(download_plugin, context, index, transfer) for index in pending]
+        for task in tasks:
+            task.result()
+
+    write_download_report([context.plugins_set[index] for index in pending])
     return None
 
 
@@ -205,64 +712,335 @@ def update_zip(context: 'GuiContext', index: int, option: bool) -> None:
         context.labels_set[index].config(text='файл поврежден')
 
 
+def remove_old_jars(jar_path: Path) -> None:
+    """
+    Удаляет из папки lib jar-файлы предыдущих версий плагина, оставляя jar_path.
+    jar-файлы, которые скачивает другой процесс, не удаляются.
+
+    """
+    for item in jar_path.parent.glob('*.jar'):
+        if item != jar_path:
+            remove_unlocked(item)
+
+
 def unpack_plugins(context: 'GuiContext') -> None:
     """
     Распаковывает все загруженные плагины из zip-архивов.
     Если распаковка успешна, обновляет путь плагина и вызывает update_zip.
+    Актуальные установленные плагины (ключ 'installed') пропускаются.
 
     """
     packed_dir: Path = get_path('packed')
     unpacked_dir: Path = get_path('unpacked')
 
     for index, plugin in enumerate(context.plugins_set):
+        if plugin.get('installed'):
+            continue
+
         file_name: str = plugin['file']
         file_ext: str = Path(file_name).suffix.lower()
 
-        if file_ext == '.zip':
-            source_path: Path = packed_dir / file_name
-            unpacked_path = zip_extractor(source_path)
+        if file_ext not in ('.zip', '.jar'):
+            continue
 
-        elif file_ext == '.jar':
-            jar_name: Path = unpacked_dir / plugin['name'] / 'lib' / plugin['file']
+        with hold_lock(artifact_lock(file_name)):
+            if file_ext == '.zip':
+                unpacked_path: str | bool = zip_extractor(packed_dir / file_name)
 
-            if jar_name.is_file():
-                unpacked_path: str | bool = plugin['name']
             else:
-                unpacked_path: str | bool = False
+                jar_name: Path = unpacked_dir / plugin['name'] / 'lib' / plugin['file']
 
-        else:
-            continue
+                with hold_lock(unpacked_lock(plugin['name'])):
+                    if jar_name.is_file():
+                        remove_old_jars(jar_name)
+                        unpacked_path: str | bool = plugin['name']
+                    else:
+                        unpacked_path: str | bool = False
 
         plugin['plugin_path'] = unpacked_path
         update_zip(context, index, bool(unpacked_path))
 
 
-def zip_extractor(source_path: Path, ) -> bool | str:
+def split_members(members: list[ZipInfo], workers: int) -> list[list[str]]:
+    """
+    Распределяет файлы архива между потоками так, чтобы суммарный объём у потоков был примерно равным.
+    Крупные файлы распределяются первыми, каждый достаётся наименее загруженному потоку.
+
+    """
+    batches: list[list[str]] = [[] for _ in range(workers)]
+    loads: list[int] = [0] * workers
+
+    for member in sorted(members, key=lambda info: info.file_size, reverse=True):
+        lightest: int = loads.index(min(loads))
+        batches[lightest].append(member.filename)
+        loads[lightest] += member.file_size
+
+    return [batch for batch in batches if batch]
+
+
+def extract_members(source_path: Path, target_path: Path, names: list[str]) -> None:
+    """
+    Извлекает указанные файлы архива через собственный дескриптор ZipFile.
+
+    """
+    with ZipFile(source_path, 'r') as zip_source:
+        for name in names:
+            zip_source.extract(name, target_path)
+
+
+def make_folders(target_path: Path, members: list[ZipInfo]) -> None:
+    """
+    Создаёт все папки архива заранее, до запуска потоков распаковки.
+    ZipFile.extract создаёт родительскую папку файла через os.makedirs без exist_ok, поэтому два потока,
+    распаковывающие файлы из одной новой папки, могут получить FileExistsError. Без этой функции
+    параллельная распаковка ненадёжна.
+
+    """
+    folders: set[Path] = set()
+    root: Path = target_path.resolve()
+
+    for member in members:
+        member_path: Path = (root / member.filename).resolve()
+        if not member_path.is_relative_to(root):
+            continue  # небезопасный путь, ZipFile.extract сам нормализует его
+        folders.add(member_path if member.is_dir() else member_path.parent)
+
+    for folder in sorted(folders):
+        folder.mkdir(parents=True, exist_ok=True)
+
+
+def file_crc(file_path: Path, chunk_size: int = 1024 * 1024) -> int:
+    """
+    Вычисляет CRC-32 файла.
+
+    """
+    crc: int = 0
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def read_manifest(manifest_path: Path) -> dict[str, list[int]]:
+    """
+    Читает манифест предыдущей распаковки: {имя файла в архиве: [размер, CRC-32]}.
+
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest_path: Path, members: list[ZipInfo]) -> None:
+    """
+    Записывает манифест распакованного архива.
+
+    """
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump({member.filename: [member.file_size, member.CRC] for member in members}, file)
+
+
+def is_unchanged(target_path: Path, member: ZipInfo, manifest: dict[str, list[int]]) -> bool:
+    """
+    Проверяет, что файл архива уже распакован и не изменился.
+    Размер сравнивается с файлом на диске, CRC-32 — с манифестом предыдущей распаковки.
+    Если файла нет в манифесте, CRC-32 вычисляется по файлу на диске.
+
+    """
+    root: Path = target_path.resolve()
+    member_path: Path = (root / member.filename).resolve()
+
+    if not member_path.is_relative_to(root):
+        return False
+
+    try:
+        if member_path.stat().st_size != member.file_size:
+            return False
+    except OSError:
+        return False
+
+    if member.filename in manifest:
+        return manifest[member.filename] == [member.file_size, member.CRC]
+
+    return file_crc(member_path) == member.CRC
+
+
+def unpacked_members(target_path: Path, folder: str) -> set[str]:
+    """
+    Возвращает имена всех файлов в папке plugin'а в формате имён архива ('<folder>/lib/x.jar').
+    Нужен для папок без манифеста: распакованных старой версией программы или при аварийной распаковке.
+
+    """
+    folder_path: Path = target_path / folder
+
+    if not folder_path.is_dir():
+        return set()
+
+    return {item.relative_to(target_path).as_posix() for item in folder_path.rglob('*') if item.is_file()}
+
+
+def remove_members(target_path: Path, names: set[str]) -> None:
+    """
+    Удаляет файлы, которых больше нет в архиве, и опустевшие после этого папки.
+    jar-файлы, которые скачивает другой процесс, не удаляются.
+
+    """
+    root: Path = target_path.resolve()
+
+    for name in names:
+        member_path: Path = (root / name).resolve()
+        if not member_path.is_relative_to(root) or member_path == root:
+            continue
+
+        if member_path.suffix.lower() == '.jar':
+            remove_unlocked(member_path)
+        else:
+            member_path.unlink(missing_ok=True)
+
+        parent: Path = member_path.parent
+        while parent != root:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+
+
+def zip_extractor(source_path: Path, target_path: Path | None = None, workers: int = EXTRACT_WORKERS) -> bool | str:
     """
     Распаковывает ZIP-архив в указанную папку и проверяет успешность извлечения.
+    Распаковываются только изменившиеся файлы: размер и CRC-32 из центрального каталога архива
+    сравниваются с манифестом предыдущей распаковки (unpacked/.manifests).
+    Файлы, которых нет в архиве, удаляются и по манифесту, и по содержимому папки plugin'а на диске.
+    Файлы распаковываются параллельно в нескольких потоках (zlib освобождает GIL),
+    у каждого потока свой дескриптор архива. Небольшие архивы распаковываются в одном потоке.
+    На время распаковки процесс держит блокировку папки plugin'а (unpacked_lock).
     Если архив не существует, пустой, повреждён или распаковка не удалась — возвращает False.
 
-    :return bool: True, если хотя бы один файл был успешно извлечён; False в противном случае.
+    :return bool | str: Имя папки верхнего уровня, если архив распакован; False в противном случае.
 
     """
-    target_path: Path = get_path('unpacked')
+    target_path: Path = target_path or get_path('unpacked')
 
     try:
         with ZipFile(source_path, 'r') as zip_source:
-            file_list: list[str] = zip_source.namelist()
+            members: list[ZipInfo] = zip_source.infolist()
+
+        if not members:
+            return False  # пустой архив
+
+        folder: str = members[0].filename.split('/')[0]
+
+        with hold_lock(unpacked_lock(folder)):
+            manifest_path: Path = target_path / MANIFEST_DIR / f'{folder}.json'
+            manifest: dict[str, list[int]] = read_manifest(manifest_path)
+
+            files: list[ZipInfo] = [member for member in members if not member.is_dir()]
+            changed: list[ZipInfo] = [member for member in files if not is_unchanged(target_path, member, manifest)]
 
-            if not file_list:
-                return False  # пустой архив
+            stale: set[str] = set(manifest) | unpacked_members(target_path, folder)
+            remove_members(target_path, stale - {member.filename for member in files})
+            make_folders(target_path, [member for member in members if member.is_dir()] + changed)
+
+            if workers <= 1 or len(changed) < PARALLEL_MIN_MEMBERS:
+                extract_members(source_path, target_path, [member.filename for member in changed])
             else:
-                zip_source.extractall(target_path)
-                any((target_path / name).exists() for name in file_list)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    tasks = [executor.submit(extract_members, source_path, target_path, batch) for batch in split_members(changed, workers)]
+                    for task in tasks:
+                        task.result()
+
+            write_manifest(manifest_path, files)
 
-                return file_list[0].split('/')[0]
+        return folder
 
     except (BadZipFile, OSError):
         return False
 
 
+def jar_version(jar_path: Path) -> str | None:
+    """
+    Возвращает версию плагина из META-INF/plugin.xml внутри jar-файла или None, если дескриптора нет.
+
+    """
+    try:
+        with ZipFile(jar_path, 'r') as jar_source:
+            descriptor: bytes = jar_source.read('META-INF/plugin.xml')
+        version: str | None = ElementTree.fromstring(descriptor).findtext('version')
+
+    except (KeyError, BadZipFile, OSError, ElementTree.ParseError):
+        return None
+
+    return version.strip() if version else None
+
+
+def installed_version(plugin_path: Path, descriptors: dict[str, dict]) -> str | None:
+    """
+    Определяет версию установленного плагина по jar-файлам в папке lib.
+    Версии кэшируются в descriptors по пути и времени изменения jar-файла,
+    jar-файл открывается только если его нет в кэше или он изменился.
+
+    """
+    lib_path: Path = plugin_path / 'lib'
+    if not lib_path.is_dir():
+        return None
+
+    version: str | None = None
+
+    for jar_path in sorted(lib_path.glob('*.jar')):
+        jar_mtime: int = jar_path.stat().st_mtime_ns
+        cached: dict | None = descriptors.get(str(jar_path))
+
+        if cached is None or cached['jar_mtime'] != jar_mtime:
+            cached = {'jar_mtime': jar_mtime, 'version': jar_version(jar_path)}
+            descriptors[str(jar_path)] = cached
+
+        if cached['version']:
+            version = cached['version']
+            break
+
+    return version
+
+
+def prune_descriptors(descriptors: dict[str, dict]) -> None:
+    """
+    Удаляет из кэша версий записи jar-файлов, которых больше нет на диске (старые версии плагинов).
+
+    """
+    for jar in [jar for jar in descriptors if not Path(jar).is_file()]:
+        del descriptors[jar]
+
+
+def mark_installed(context: 'GuiContext', charm_folder: str) -> None:
+    """
+    Сравнивает версию установленного в PyCharm плагина с версией из маркета ('version').
+    Если версии совпадают, ставит плагину 'installed' = True и пишет на label 'актуален':
+    такой плагин не скачивается, не распаковывается и не устанавливается.
+    Путь распаковки 'plugin_path', оставшийся от предыдущей операции, у такого плагина сбрасывается.
+    Из кэша версий descriptors удаляются записи несуществующих jar-файлов.
+
+    """
+    install_path: Path = Path(charm_folder) / 'plugins'
+    prune_descriptors(context.descriptors)
+
+    for index, plugin in enumerate(context.plugins_set):
+        folder: str | None = plugin.get('plugin_path') or plugin.get('folder')
+        plugin['installed'] = False
+
+        if not folder or not plugin.get('version') or not (install_path / folder).is_dir():
+            continue
+
+        if installed_version(install_path / folder, context.descriptors) == plugin['version']:
+            plugin['installed'] = True
+            plugin['folder'] = folder
+            plugin.pop('plugin_path', None)
+            context.progress_set[index].configure(maximum=1, value=1)
+            context.labels_set[index].config(text='актуален')
+
+
 def update_setup(context: 'GuiContext', index: int, option: bool) -> None:
     """
     Ставит progress bar всех устанавливаемых плагинов на 100%
@@ -292,45 +1070,104 @@ def update_setup(context: 'GuiContext', index: int, option: bool) -> None:
         context.labels_set[index].config(text='ошибка установки')
 
 
+def lower_priority() -> None:
+    """
+    Понижает приоритет текущего потока (Windows и Linux), на других системах ничего не делает.
+
+    """
+    try:
+        if sys.platform == 'win32':
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_LOWEST)
+        elif sys.platform.startswith('linux'):
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+def purge_trash(trash_path: Path) -> None:
+    """
+    Удаляет содержимое папки trash_path в фоновом потоке с пониженным приоритетом.
+
+    """
+    def purge() -> None:
+        lower_priority()
+        for item in trash_path.iterdir():
+            shutil.rmtree(item, ignore_errors=True)
+
+    if trash_path.is_dir():
+        threading.Thread(target=purge, name='TrashPurge', daemon=True).start()
+
+
+def swap_folder(staged_path: Path, des_path: Path, old_path: Path | None, trash_path: Path) -> bool:
+    """
+    Заменяет папку plugin'а подготовленной копией: старая папка переименовывается в trash_path,
+    подготовленная — на её место. Если второе переименование не удалось, старая папка возвращается.
+
+    """
+    trashed_path: Path | None = None
+
+    try:
+        if old_path is not None:
+            trash_path.mkdir(parents=True, exist_ok=True)
+            trashed_path = trash_path / f'{old_path.name}.{time.time_ns()}'
+            old_path.rename(trashed_path)
+
+        staged_path.rename(des_path)
+        return True
+
+    except OSError:
+        if trashed_path is not None and trashed_path.exists() and not old_path.exists():
+            trashed_path.rename(old_path)
+        return False
+
+
 def setup_plugins(context: 'GuiContext', charm_folder: str) -> None:
     """
     Если install_path не существует, создает её.
-    Если install_path уществует, то проверят папки в unpacked_path.
-    Удаляет.папки с такими же именами в install_path остальные папки не трогает.
-    Копирует все плагины из unpacked_path в install_path
+    Каждый plugin сначала копируется из unpacked_path во временную папку рядом с install_path (STAGING_FOLDER),
+    затем старая папка с тем же именем (без учёта регистра) переименовывается в корзину (TRASH_FOLDER),
+    а новая переносится на её место. Установка plugin'а выполняется целиком или не выполняется совсем,
+    остальные папки в install_path не трогаются. Корзина очищается в фоновом потоке.
+    Папка plugin'а копируется из unpacked_path под блокировкой unpacked_lock.
+    Актуальные установленные плагины (ключ 'installed') пропускаются.
 
     """
     unpacked_path: Path = get_path('unpacked')
 
     charm_path: Path = Path(charm_folder)
     install_path: Path = charm_path / 'plugins'
+    staging_path: Path = charm_path / STAGING_FOLDER
+    trash_path: Path = charm_path / TRASH_FOLDER
 
-    if not install_path.is_dir():
-        install_path.mkdir(parents=True, exist_ok=True)
+    install_path.mkdir(parents=True, exist_ok=True)
+    shutil.rmtree(staging_path, ignore_errors=True)
 
-    else:
-        # Список папок для удаления
-        storage_folders = tuple(plugin['plugin_path'].lower() for plugin in context.plugins_set if plugin['plugin_path'] is not False)
+    # Установленные plugin'ы по имени папки без учёта регистра
+    installed: dict[str, Path] = {item.name.lower(): item for item in install_path.iterdir() if item.is_dir()}
+
+    for index, plugin in enumerate(context.plugins_set):
 
-        # Удаление старых plugin'ов
-        for item in install_path.iterdir():
-            if item.is_dir() and item.name.lower() in storage_folders:
-                shutil.rmtree(item)
+        if plugin.get('installed') or plugin.get('plugin_path', False) is False:
+            continue
 
-        # Копирование новых plugin'ов
-        for index, plugin in enumerate(context.plugins_set):
+        src_path: Path = unpacked_path / plugin['plugin_path']
+        staged_path: Path = staging_path / plugin['plugin_path']
+        des_path: Path = install_path / plugin['plugin_path']
 
-            if plugin['plugin_path'] is not False:
+        with hold_lock(unpacked_lock(plugin['plugin_path'])):
+            result = copy_with_status(src_path, staged_path)
 
-                src_path: Path = unpacked_path / plugin['plugin_path']
-                des_path: Path = install_path / plugin['plugin_path']
+        if result in ('Error', ''):
+            shutil.rmtree(staged_path, ignore_errors=True)
+            update_setup(context, index, False)
+            continue
 
-                result = copy_with_status(src_path, des_path)
+        swapped: bool = swap_folder(staged_path, des_path, installed.get(plugin['plugin_path'].lower()), trash_path)
+        update_setup(context, index, swapped)
 
-                if result == 'Error':
-                    update_setup(context, index, False)
-                else:
-                    update_setup(context, index, True)
+    shutil.rmtree(staging_path, ignore_errors=True)
+    purge_trash(trash_path)
 
 
 def copy_with_status(source: Path, destination: Path) -> str:
@@ -362,5 +1199,26 @@ def copy_with_status(source: Path, destination: Path) -> str:
     return status
 
 
+def benchmark_extract(source_path: Path, workers: int = EXTRACT_WORKERS) -> tuple[float, float]:
+    """
+    Сравнивает время ZipFile.extractall и zip_extractor на одном архиве.
+    Возвращает (время extractall, время zip_extractor) в секундах.
+
+    """
+    with tempfile.TemporaryDirectory() as single_dir, tempfile.TemporaryDirectory() as parallel_dir:
+        start: float = time.perf_counter()
+        with ZipFile(source_path, 'r') as zip_source:
+            zip_source.extractall(single_dir)
+        single_time: float = time.perf_counter() - start
+
+        start: float = time.perf_counter()
+        zip_extractor(source_path, Path(parallel_dir), workers)
+        parallel_time: float = time.perf_counter() - start
+
+    return single_time, parallel_time
+
+
 if __name__ == '__main__':
-    pass
\ No newline at end of file
+    for archive in sys.argv[1:]:
+        extractall_time, extractor_time = benchmark_extract(Path(archive))
+        print(f'{archive}: extractall {extractall_time:.3f} s, zip_extractor {extractor_time:.3f} s')
\ No newline at end of file
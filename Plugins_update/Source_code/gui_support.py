@@ -1,16 +1,30 @@
 from typing import Any, Callable, Optional
 
+import os
+import re
 import sys
 import queue
+import datetime
 import threading
 
 import tkinter as tk
 from tkinter import ttk
 
 from pathlib import Path
+from collections import Counter
 from dataclasses import dataclass, field
 
 
+# Включение профилирования фоновых задач: PLUGINS_PROFILE=1
+PROFILE_ENABLED: bool = os.environ.get('PLUGINS_PROFILE', '') == '1'
+
+# Интервал между снимками стеков потоков (сек)
+PROFILE_INTERVAL: float = 0.01
+
+# Интервал перерисовки видимых строк списка plugin'ов (мс)
+REFRESH_INTERVAL: int = 50
+
+
 class SafeWidgetPatcher:
     """
     Класс для безопасного monkey-patching ttk.Label и ttk.Progressbar.
@@ -82,15 +96,99 @@ class SafeWidgetPatcher:
         return threading.current_thread().name == 'MainThread'
 
 
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик потоков приложения.
+    Раз в interval секунд снимает стеки всех потоков через sys._current_frames()
+    и по команде stop() записывает их в формате collapsed stack (flamegraph.pl, speedscope).
+
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, folder: Path | None = None) -> None:
+        self._interval: float = interval
+        self._folder: Path = folder or Path(resource_path('profiles'))
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        """
+        Возвращает True, если профилировщик запущен.
+
+        """
+        return self._thread is not None
+
+    def start(self) -> None:
+        """
+        Запускает сбор снимков в отдельном потоке.
+
+        """
+        if self.running:
+            return
+
+        self._stacks.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name='Profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Path | None:
+        """
+        Останавливает сбор снимков и записывает их в файл profiles/profile_<дата_время>.collapsed.
+        Возвращает путь к файлу или None, если снимков нет.
+
+        """
+        if not self.running:
+            return None
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+        if not self._stacks:
+            return None
+
+        self._folder.mkdir(parents=True, exist_ok=True)
+        profile_path: Path = self._folder / f'profile_{datetime.datetime.now():%Y%m%d_%H%M%S}.collapsed'
+
+        with open(profile_path, 'w', encoding='utf-8') as file:
+            for stack, count in self._stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+        return profile_path
+
+    def _sample(self) -> None:
+        own_ident: int = threading.get_ident()
+
+        while not self._stop.wait(self._interval):
+            names: dict[int, str] = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():  # noqa protected member
+                if ident == own_ident:
+                    continue
+
+                frames: list[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f'{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})')
+                    frame = frame.f_back
+
+                # Потоки одного пула различаются только номером после '_', объединяем их, номер пула сохраняем
+                thread_name: str = re.sub(r'_\d+$', '', names.get(ident, 'Thread'))
+                self._stacks[';'.join([thread_name, *reversed(frames)])] += 1
+
+
 class ThreadTaskManager:
     """
     Менеджер задач в отдельном потоке
+    При profile=True (или PLUGINS_PROFILE=1) каждая цепочка задач профилируется SamplingProfiler.
 
     """
 
-    def __init__(self) -> None:
+    def __init__(self, profile: bool = PROFILE_ENABLED) -> None:
         self._task_queue: queue.Queue = queue.Queue()
-        self._worker_thread = threading.Thread(target=self._worker, daemon=True)
+        self._profiler: SamplingProfiler | None = SamplingProfiler() if profile else None
+        self._worker_thread = threading.Thread(target=self._worker, name='TaskWorker', daemon=True)
         self._running = threading.Event()
         self._running.set()
         self._worker_thread.start()
@@ -125,6 +223,8 @@ class ThreadTaskManager:
         Добавить задачу в очередь на выполнение
 
         """
+        if self._profiler is not None:
+            self._profiler.start()
         self._task_queue.put((func, args, kwargs))
 
     def wait_ready(self, widget: tk.Widget | ttk.Widget, callback: Callable[[], None | tuple[None, None]], delay: int = 100) -> None:
@@ -139,6 +239,8 @@ class ThreadTaskManager:
         """
         def check() -> None:
             if self._task_queue.unfinished_tasks == 0:
+                if self._profiler is not None:
+                    self._profiler.stop()
                 callback()
             else:
                 widget.after(delay, check)  # noqa parameter unfilled
@@ -160,6 +262,225 @@ class ThreadTaskManager:
         threading.Thread(target=stop_thread, daemon=True).start()
 
 
+@dataclass(slots=True)
+class PluginState:
+    """
+    Состояние строки plugin'а в списке, хранится отдельно от виджетов.
+    get()/set() совместимы с tk.BooleanVar и возвращают/устанавливают выбор plugin'а.
+
+    """
+    name: str
+    url: str
+    selected: bool = False
+    value: float = 0
+    maximum: float = 100
+    text: str = 'не выбран'
+    style: str = 'Horizontal.TProgressbar'
+    notify: Callable[[], None] = field(default=lambda: None, repr=False)
+
+    def get(self) -> bool:
+        return self.selected
+
+    def set(self, value: bool) -> None:
+        self.selected = bool(value)
+        self.notify()
+
+
+class StateView:
+    """
+    Заменяет виджет для фоновых задач: config/configure/cget и [] меняют PluginState,
+    а VirtualList перерисовывает видимые строки в главном потоке.
+
+    """
+
+    _keys: tuple[str, ...] = ()
+
+    def __init__(self, state: PluginState) -> None:
+        self._state: PluginState = state
+
+    def config(self, **kwargs: Any) -> None:
+        for key, value in kwargs.items():
+            if key in self._keys:
+                setattr(self._state, key, value)
+        self._state.notify()
+
+    configure = config
+
+    def cget(self, key: str) -> Any:
+        return getattr(self._state, key)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.cget(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.config(**{key: value})
+
+
+class LabelView(StateView):
+    """
+    Текстовая метка строки plugin'а (ttk.Label)
+
+    """
+    _keys = ('text',)
+
+
+class ProgressView(StateView):
+    """
+    Индикатор прогресса строки plugin'а (ttk.Progressbar)
+
+    """
+    _keys = ('value', 'maximum', 'style')
+
+
+class VirtualRow:
+    """
+    Виджеты одной видимой строки списка: чекбокс, индикатор прогресса и метка.
+
+    """
+
+    def __init__(self, parent: ttk.Frame, top: int, checkbox_factory: Callable[..., tk.Checkbutton], on_toggle: Callable[[], None]) -> None:
+        self.state: PluginState | None = None
+        self._painted: tuple | None = None
+        self._on_toggle: Callable[[], None] = on_toggle
+
+        self.variable: tk.BooleanVar = tk.BooleanVar(value=False)
+        self.check: tk.Checkbutton = checkbox_factory(parent, variable=self.variable, command=self._toggle)
+        self.progress: ttk.Progressbar = ttk.Progressbar(parent, orient='horizontal', length=430, mode='determinate', maximum=100)
+        self.label: ttk.Label = ttk.Label(parent, text='не выбран', font=('Arial', 11))
+        self.top: int = top
+
+    def _toggle(self) -> None:
+        if self.state is not None:
+            self.state.set(self.variable.get())
+            self._on_toggle()
+
+    def paint(self, state: PluginState | None) -> None:
+        """
+        Показывает в строке state или скрывает строку, если state равен None.
+        Виджеты обновляются только если данные изменились.
+
+        """
+        if state is None:
+            if self.state is not None:
+                self.check.place_forget()
+                self.progress.place_forget()
+                self.label.place_forget()
+            self.state, self._painted = None, None
+            return
+
+        if self.state is None:
+            self.check.place(x=20, y=self.top)
+            self.progress.place(x=210, y=self.top + 2)
+            self.label.place(x=650, y=self.top)
+
+        self.state = state
+        snapshot: tuple = (state.name, state.selected, state.value, state.maximum, state.text, state.style)
+        if snapshot == self._painted:
+            return
+
+        self.check.configure(text=state.name)
+        self.variable.set(state.selected)
+        self.progress.configure(maximum=state.maximum, value=state.value, style=state.style)
+        self.label.configure(text=state.text)
+        self._painted = snapshot
+
+
+class VirtualList(ttk.Frame):
+    """
+    Список plugin'ов, в котором виджеты создаются только для видимых строк.
+    Состояние каждого plugin'а хранится в PluginState, строки перерисовываются
+    в главном потоке не чаще чем раз в REFRESH_INTERVAL мс. Поддерживает фильтр по имени и url.
+
+    """
+
+    def __init__(self, parent: tk.Widget, plugins_pack: list[dict[str, Any]], rows: int, row_height: int,
+                 checkbox_factory: Callable[..., tk.Checkbutton], on_toggle: Callable[[], None]) -> None:
+        super().__init__(parent)
+
+        self._dirty: bool = True
+        self._offset: int = 0
+        self._query: str = ''
+
+        self.states: list[PluginState] = [PluginState(name=plugin['name'], url=plugin['url'], notify=self._mark_dirty) for plugin in plugins_pack]
+        self.labels: list[LabelView] = [LabelView(state) for state in self.states]
+        self.progress: list[ProgressView] = [ProgressView(state) for state in self.states]
+
+        self._keys: list[str] = [f'{state.name}\n{state.url}'.casefold() for state in self.states]
+        self._visible: list[int] = list(range(len(self.states)))
+
+        self._rows: list[VirtualRow] = [VirtualRow(self, row * row_height, checkbox_factory, on_toggle) for row in range(min(rows, len(self.states)))]
+
+        self._scrollbar: ttk.Scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scroll)
+        if len(self.states) > rows:
+            self._scrollbar.place(relx=1, x=-16, y=0, width=14, relheight=1)
+
+        for widget in (self, *[child for row in self._rows for child in (row.check, row.progress, row.label)]):
+            widget.bind('<MouseWheel>', self._on_wheel)
+            widget.bind('<Button-4>', lambda _: self.scroll(-1))
+            widget.bind('<Button-5>', lambda _: self.scroll(1))
+
+        self._tick()
+
+    def _mark_dirty(self) -> None:
+        self._dirty = True
+
+    def _tick(self) -> None:
+        if self._dirty:
+            self.paint()
+        self.after(REFRESH_INTERVAL, self._tick)  # noqa parameter unfilled
+
+    def paint(self) -> None:
+        """
+        Перерисовывает видимые строки и полосу прокрутки.
+
+        """
+        self._dirty = False
+
+        for position, row in enumerate(self._rows):
+            index: int = self._offset + position
+            row.paint(self.states[self._visible[index]] if index < len(self._visible) else None)
+
+        if self._visible:
+            self._scrollbar.set(self._offset / len(self._visible), min(1.0, (self._offset + len(self._rows)) / len(self._visible)))
+
+    def scroll(self, step: int) -> None:
+        """
+        Сдвигает видимую часть списка на step строк.
+
+        """
+        max_offset: int = max(0, len(self._visible) - len(self._rows))
+        offset: int = min(max(0, self._offset + step), max_offset)
+
+        if offset != self._offset:
+            self._offset = offset
+            self.paint()
+
+    def _on_wheel(self, event: tk.Event) -> None:
+        self.scroll(-1 if event.delta > 0 else 1)
+
+    def _on_scroll(self, action: str, amount: str, unit: str | None = None) -> None:
+        if action == 'moveto':
+            self.scroll(round(float(amount) * len(self._visible)) - self._offset)
+        elif unit == 'pages':
+            self.scroll(int(amount) * len(self._rows))
+        else:
+            self.scroll(int(amount))
+
+    def filter(self, query: str) -> None:
+        """
+        Оставляет в списке plugin'ы, у которых имя или url содержит query (без учёта регистра).
+        Если query дополняет предыдущий запрос, поиск идёт только среди уже найденных plugin'ов.
+
+        """
+        query: str = query.strip().casefold()
+        source: list[int] = self._visible if self._query and query.startswith(self._query) else range(len(self.states))
+
+        self._visible = [index for index in source if query in self._keys[index]]
+        self._query = query
+        self._offset = 0
+        self.paint()
+
+
 @dataclass
 class GuiContext:
     """
@@ -169,13 +490,15 @@ class GuiContext:
     """
     plugins_pack: list[dict[str, str]] = field(default_factory=list)
 
-    plugins: list[tk.BooleanVar] = field(default_factory=list)
-    progress: list[ttk.Progressbar] = field(default_factory=list)
-    labels: list[ttk.Label] = field(default_factory=list)
+    plugins: list[PluginState] = field(default_factory=list)
+    progress: list[ProgressView] = field(default_factory=list)
+    labels: list[LabelView] = field(default_factory=list)
 
     plugins_set: list[dict[str, str | int | bool | None]] = field(default_factory=list)
-    progress_set: list[ttk.Progressbar] = field(default_factory=list)
-    labels_set: list[ttk.Label] = field(default_factory=list)
+    progress_set: list[ProgressView] = field(default_factory=list)
+    labels_set: list[LabelView] = field(default_factory=list)
+
+    descriptors: dict[str, dict[str, int | str | None]] = field(default_factory=dict)
 
 
 @dataclass
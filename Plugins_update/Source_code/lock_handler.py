@@ -0,0 +1,152 @@
+from typing import Callable, Iterator
+
+import os
+import sys
+import time
+
+from pathlib import Path
+from contextlib import contextmanager
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+
+# Интервал повторной попытки захвата занятой блокировки (сек)
+LOCK_POLL: float = 0.2
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка на основе lock-файла (msvcrt.locking в Windows, fcntl.flock в остальных системах).
+    Блокировка снимается системой при завершении процесса, даже аварийном.
+    Пока блокировка захвачена, в lock-файл записан pid владельца.
+
+    """
+
+    def __init__(self, lock_path: Path) -> None:
+        self._lock_path: Path = lock_path
+        self._file = None
+
+    @property
+    def locked(self) -> bool:
+        """
+        Возвращает True, если блокировка захвачена этим объектом.
+
+        """
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """
+        Пытается захватить блокировку без ожидания.
+
+        :return: True, если блокировка захвачена; False, если её держит другой процесс или поток.
+
+        """
+        if self._file is not None:
+            return True
+
+        self._lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self._lock_path, 'a+')
+
+        try:
+            if sys.platform == 'win32':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+                # lock-файл мог быть удалён discard() другого процесса, пока этот процесс ждал блокировку
+                if os.stat(self._lock_path).st_ino != os.fstat(lock_file.fileno()).st_ino:
+                    raise FileNotFoundError(self._lock_path)
+
+        except OSError:
+            lock_file.close()
+            return False
+
+        # pid владельца для диагностики, первый байт файла занят блокировкой в Windows
+        lock_file.seek(1)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+
+        self._file = lock_file
+        return True
+
+    def release(self) -> None:
+        """
+        Снимает блокировку.
+
+        """
+        if self._file is None:
+            return
+
+        try:
+            if sys.platform == 'win32':
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+
+        finally:
+            self._file.close()
+            self._file = None
+
+    def discard(self) -> None:
+        """
+        Снимает блокировку и удаляет lock-файл.
+        В Windows открытый другим процессом lock-файл не удаляется.
+
+        """
+        if self._file is None:
+            return
+
+        if sys.platform != 'win32':
+            self._lock_path.unlink(missing_ok=True)
+            self.release()
+            return
+
+        self.release()
+        try:
+            self._lock_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+@contextmanager
+def hold_lock(lock_path: Path, on_wait: Callable[[], None] | None = None) -> Iterator[FileLock]:
+    """
+    Захватывает блокировку lock_path, ожидая её освобождения другим процессом.
+    Пока блокировка занята, раз в LOCK_POLL секунд вызывается on_wait.
+
+    """
+    lock: FileLock = FileLock(lock_path)
+
+    while not lock.acquire():
+        if on_wait is not None:
+            on_wait()
+        time.sleep(LOCK_POLL)
+
+    try:
+        yield lock
+    finally:
+        lock.release()
+
+
+@contextmanager
+def try_lock(lock_path: Path) -> Iterator[bool]:
+    """
+    Захватывает блокировку lock_path без ожидания.
+    Возвращает True, если блокировка захвачена, и False, если она занята другим процессом.
+
+    """
+    lock: FileLock = FileLock(lock_path)
+    acquired: bool = lock.acquire()
+
+    try:
+        yield acquired
+    finally:
+        lock.release()
@@ -1,8 +1,11 @@
 from typing import TYPE_CHECKING
 
 import re
+import time
 import requests
 from tkinter import ttk
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -10,16 +13,86 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.common.options import ArgOptions
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 
+from gui_support import resource_path
+
 if TYPE_CHECKING:
     from gui_support import GuiContext
 
 
-def get_driver() -> WebDriver | None:
+# XPath ссылки для скачивания на странице плагина в маркете JetBrains
+DOWNLOAD_XPATH: str = '//a[contains(@href, "/plugin/download")]'
+
+# Максимальное время ожидания ссылки и интервал опроса страницы (сек)
+PAGE_TIMEOUT: float = 20
+POLL_FREQUENCY: float = 0.1
+
+# Размер общего дискового кэша браузера (байт)
+CACHE_SIZE: int = 32 * 1024 * 1024
+
+# API маркета JetBrains с данными о версии плагина по updateId из ссылки для скачивания
+UPDATES_API: str = 'https://plugins.jetbrains.com/api/updates/{update_id}'
+
+# Ресурсы, которые не нужны для поиска ссылки: изображения, шрифты и сторонние хосты
+BLOCKED_URLS: list[str] = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*hotjar.com*', '*intercom.io*', '*sentry.io*', '*youtube.com*',
+]
+
+
+def cache_path() -> Path:
+    """
+    Возвращает путь к общему дисковому кэшу браузера.
+
+    """
+    cache_dir: Path = Path(resource_path('cache')) / 'browser'
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def lean_options(browser_name: str, options: ArgOptions) -> None:
+    """
+    Настраивает облегченный профиль браузера: стратегия загрузки eager,
+    без изображений, шрифтов и сторонних хостов, небольшой общий дисковый кэш.
+
+    """
+    options.page_load_strategy = 'eager'
+
+    if browser_name == 'Firefox':
+        options.set_preference('permissions.default.image', 2)
+        options.set_preference('browser.display.use_document_fonts', 0)
+        options.set_preference('privacy.trackingprotection.enabled', True)
+        options.set_preference('browser.cache.disk.parent_directory', str(cache_path()))
+        options.set_preference('browser.cache.disk.capacity', CACHE_SIZE // 1024)
+    else:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_argument(f'--disk-cache-dir={cache_path()}')
+        options.add_argument(f'--disk-cache-size={CACHE_SIZE}')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+
+def block_urls(driver: WebDriver) -> None:
+    """
+    Блокирует загрузку BLOCKED_URLS через DevTools (только для Chrome и Edge).
+
+    """
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+    except (AttributeError, WebDriverException):
+        pass
+
+
+def get_driver(lean: bool = True) -> WebDriver | None:
     """
     Возвращает WebDriver Chrome, Firefox или Edge c headless-режимом.
 
+    :param lean: использовать облегченный профиль для поиска ссылок
+
     """
     browsers = [
         ('Chrome', webdriver.Chrome),
@@ -31,13 +104,59 @@ def get_driver() -> WebDriver | None:
         try:
             options = getattr(webdriver, f'{browser_name}Options')()
             options.add_argument('--headless')
-            return driver(options=options)
+
+            if not lean:
+                return driver(options=options)
+
+            lean_options(browser_name, options)
+            lean_driver: WebDriver = driver(options=options)
+            if browser_name != 'Firefox':
+                block_urls(lean_driver)
+            return lean_driver
+
         except WebDriverException:
             continue
 
     return None
 
 
+def js_heap_size(driver: WebDriver) -> int | None:
+    """
+    Возвращает объём JS-кучи страницы в байтах (performance.memory.usedJSHeapSize) или None,
+    если браузер его не сообщает. Это не память процесса браузера, API есть только в Chromium-браузерах.
+
+    """
+    try:
+        memory = driver.execute_script('return window.performance.memory ? window.performance.memory.usedJSHeapSize : null')
+    except WebDriverException:
+        return None
+
+    return int(memory) if memory else None
+
+
+def find_download(driver: WebDriver, url: str) -> tuple[str | None, float, int | None]:
+    """
+    Открывает страницу плагина и ждёт появления ссылки для скачивания.
+    Возвращает (download_url, время загрузки страницы в секундах, объём JS-кучи страницы в байтах).
+    download_url равен None, если ссылка не найдена.
+
+    """
+    start: float = time.perf_counter()
+    download_url: str | None = None
+
+    try:
+        driver.get(url)
+        wait = WebDriverWait(driver, PAGE_TIMEOUT, poll_frequency=POLL_FREQUENCY)
+        download: WebElement = wait.until(expected_conditions.presence_of_element_located((By.XPATH, DOWNLOAD_XPATH)))
+        download_url: str | None = download.get_attribute('href')
+
+    except (TimeoutException, NoSuchElementException, WebDriverException):
+        pass
+
+    page_time: float = round(time.perf_counter() - start, 3)
+    return download_url, page_time, js_heap_size(driver)
+
+
 def file_properties(url: str) -> tuple[str | None, int | None]:
     """
     Делает HEAD-запрос и для определения имени файла и размера файла.
@@ -66,6 +185,27 @@ def file_properties(url: str) -> tuple[str | None, int | None]:
         return None, None
 
 
+def marketplace_version(download_url: str) -> str | None:
+    """
+    Возвращает версию плагина по ссылке для скачивания (параметр updateId) через API маркета.
+    Возвращает None если версию определить не удалось.
+
+    """
+    update_id: list[str] = parse_qs(urlsplit(download_url).query).get('updateId', [])
+    if not update_id:
+        return None
+
+    try:
+        response: requests.Response = requests.get(UPDATES_API.format(update_id=update_id[0]), timeout=10)
+        response.raise_for_status()
+        version = response.json().get('version')
+
+    except (requests.RequestException, ValueError, AttributeError):
+        return None
+
+    return str(version) if version else None
+
+
 # Функции интерфейса
 
 def seek_label(context: 'GuiContext', index: int) -> None:
@@ -88,13 +228,17 @@ def found_label(context: 'GuiContext', index: int, option: bool) -> None:
 
 
 # Управляющая функция
-def process_plugins(context: 'GuiContext') -> None:
+def process_plugins(context: 'GuiContext', versions: bool = False) -> None:
     """
     Добавляет данные в список плагинов (ссылка для загрузки, имя и размер файла)
     Функция обрабатывает плагины из списка, и записывает информацию исходныЙ словарь:
-    context.plugins_set c ключами 'download_url', 'file' и 'file_size'.
+    context.plugins_set c ключами 'download_url', 'file', 'file_size' и 'version'.
+    Версия из API маркета ('version') запрашивается только при versions=True: она нужна mark_installed
+    для пропуска актуальных плагинов, при простом скачивании лишний запрос не делается.
+    Время загрузки страницы и объём JS-кучи записываются в 'page_time' и 'page_heap' и попадают в отчёт о загрузке.
 
     :param context: контекст ctx из Update_GUI
+    :param versions: запрашивать версию плагина через API маркета
 
     """
     driver: WebDriver = get_driver()
@@ -104,25 +248,25 @@ def process_plugins(context: 'GuiContext') -> None:
             url = plugin['url']
 
             seek_label(context, index)
-            driver.get(url)
+            download_url, page_time, page_heap = find_download(driver, url)
 
-            try:
-                wait = WebDriverWait(driver, 20)
-                download: WebElement = wait.until(expected_conditions.presence_of_element_located((By.XPATH, '//a[contains(@href, "/plugin/download")]')))
+            plugin['page_time'] = page_time
+            plugin['page_heap'] = page_heap
 
-                download_url: str = download.get_attribute('href')
-                file_name, file_size = file_properties(download_url)
+            if download_url is None:
+                found_label(context, index, False)
+                continue
 
-                if file_name is not None and file_size is not None:
-                    plugin['download_url'] = download_url
-                    plugin['file'] = file_name
-                    plugin['file_size'] = file_size
+            file_name, file_size = file_properties(download_url)
 
-                    found_label(context, index, True)
-                else:
-                    found_label(context, index, False)
+            if file_name is not None and file_size is not None:
+                plugin['download_url'] = download_url
+                plugin['file'] = file_name
+                plugin['file_size'] = file_size
+                plugin['version'] = marketplace_version(download_url) if versions else None
 
-            except (TimeoutException, NoSuchElementException, WebDriverException):
+                found_label(context, index, True)
+            else:
                 found_label(context, index, False)
 
     finally:
@@ -130,5 +274,35 @@ def process_plugins(context: 'GuiContext') -> None:
     return None
 
 
+def benchmark_pages(urls: list[str], lean: bool) -> list[tuple[str, float, int | None]]:
+    """
+    Замеряет время загрузки страниц и объём JS-кучи для профиля lean или обычного.
+
+    """
+    driver: WebDriver | None = get_driver(lean)
+    if driver is None:
+        return []
+
+    results: list[tuple[str, float, int | None]] = []
+    try:
+        for url in urls:
+            _, page_time, page_heap = find_download(driver, url)
+            results.append((url, page_time, page_heap))
+    finally:
+        driver.quit()
+
+    return results
+
+
 if __name__ == '__main__':
-    pass
\ No newline at end of file
+    from db_handler import fetch_plugin_pack
+
+    plugin_urls: list[str] = [plugin['url'] for plugin in fetch_plugin_pack() or []]
+
+    for profile in (False, True):
+        report = benchmark_pages(plugin_urls, profile)
+        total: float = sum(page_time for _, page_time, _ in report)
+        print(f'{"lean" if profile else "normal"}: {total:.2f} s')
+        for page_url, page_time, page_heap in report:
+            heap_mb: str = f'{page_heap / 1024 / 1024:.1f} MB' if page_heap else '-'
+            print(f'  {page_time:>7.3f} s  {heap_mb:>9}  {page_url}')
\ No newline at end of file